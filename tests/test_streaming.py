@@ -0,0 +1,155 @@
+"""
+Regression tests for streamed verse responses. verse_notes reads its .env at
+import time, so a throwaway data directory is set up before importing it.
+"""
+import gzip
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_data_home = Path(tempfile.mkdtemp())
+os.environ["XDG_DATA_HOME"] = str(_data_home)
+os.environ["HOME"] = str(_data_home)
+for _app_dir in (_data_home / "verse_notes",
+                 _data_home / "Library" / "Application Support" / "verse_notes",
+                 _data_home / ".verse_notes_data"):
+    _app_dir.mkdir(parents=True, exist_ok=True)
+    (_app_dir / ".env").write_text("API_URL=http://127.0.0.1:1/\nAPI_KEY=test\nFILE=test\n")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import verse_notes  # noqa: E402
+
+
+def _serve_once(raw_response, hold_open=0.0):
+    """
+    Starts a one-shot server that sends raw_response to the first client, then
+    keeps the socket open for hold_open seconds before closing it.
+    Returns the URL to request.
+    """
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def handle():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(raw_response)
+        threading.Event().wait(hold_open)
+        conn.close()
+        server.close()
+
+    threading.Thread(target=handle, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/"
+
+
+class _KeepAliveServer(ThreadingHTTPServer):
+    """
+    HTTP/1.1 server that answers every request with the same body and
+    counts the TCP connections it accepts.
+    """
+    daemon_threads = True
+
+    def __init__(self, body, headers):
+        self.body = body
+        self.extra_headers = headers
+        self.connections = 0
+        super().__init__(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1 # setup() runs once per connection
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        for name, value in self.server.extra_headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+CHUNKED_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Transfer-Encoding: chunked\r\n"
+    b"\r\n"
+)
+
+
+class StreamingErrorTests(unittest.TestCase):
+    def setUp(self):
+        self._saved = (verse_notes.API_URL, verse_notes.REQUEST_TIMEOUT)
+
+    def tearDown(self):
+        verse_notes.API_URL, verse_notes.REQUEST_TIMEOUT = self._saved
+
+    def test_truncated_chunked_body_is_reported(self):
+        # Promises a 0x40-byte chunk, sends part of it and hangs up
+        verse_notes.API_URL = _serve_once(CHUNKED_HEADERS + b"40\r\n{\"verses\": [{\"ref\": \"John 3:16\"")
+        output, text_to_copy = verse_notes.render_verses("John 3:16")
+        self.assertIn("Network or API error", output)
+        self.assertEqual(text_to_copy, [])
+
+    def test_stalled_body_is_reported(self):
+        # Sends the headers, then goes quiet past the read timeout
+        verse_notes.API_URL = _serve_once(CHUNKED_HEADERS, hold_open=2.0)
+        verse_notes.REQUEST_TIMEOUT = (1, 0.5)
+        output, text_to_copy = verse_notes.render_verses("John 3:16")
+        self.assertIn("Network or API error", output)
+        self.assertEqual(text_to_copy, [])
+
+
+class ConnectionReuseTests(unittest.TestCase):
+    def setUp(self):
+        self._saved_url = verse_notes.API_URL
+
+    def tearDown(self):
+        verse_notes.API_URL = self._saved_url
+
+    def _lookup_three_times(self, body, headers=None):
+        server = _KeepAliveServer(body, headers or {})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        verse_notes.API_URL = server.url
+        outputs = [verse_notes.render_verses("Nothing 1:1")[0] for _ in range(3)]
+        return server, outputs
+
+    def test_empty_response_reuses_connection(self):
+        server, outputs = self._lookup_three_times(b'{"verses":[]}')
+        self.assertTrue(all("Verse not found" in output for output in outputs))
+        self.assertEqual(server.connections, 1)
+
+    def test_gzipped_empty_response_reuses_connection(self):
+        # Compressed, the empty body is longer than MIN_VERSES_LENGTH on the wire
+        server, outputs = self._lookup_three_times(
+            gzip.compress(b'{"verses":[]}'), {"Content-Encoding": "gzip"}
+        )
+        self.assertTrue(all("Verse not found" in output for output in outputs))
+        self.assertEqual(server.connections, 1)
+
+    def test_small_response_reuses_connection(self):
+        server, outputs = self._lookup_three_times(b'{"verses":[{"ref":"John 3:16","text":"For God"}]}')
+        self.assertTrue(all("Found 1 verse(s)." in output for output in outputs))
+        self.assertEqual(server.connections, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
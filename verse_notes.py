@@ -1,4 +1,8 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+import atexit
 import os
 from dotenv import load_dotenv
 import pyperclip
@@ -7,9 +11,29 @@ import json
 import shlex
 import codecs
 from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
+from prompt_toolkit.history import FileHistory, ThreadedHistory
 import re
+import sqlite3
+import bisect
 from pathlib import Path
+from functools import lru_cache
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson is optional; fall back to the stdlib json module when it's missing.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# ijson is optional too; without it every response is decoded in one go.
+try:
+    import ijson
+    _JSON_ERRORS = (ValueError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    _JSON_ERRORS = (ValueError,)
 
 def get_app_data_dir():
     """
@@ -48,15 +72,31 @@ def get_app_data_dir():
 # Version Number
 CURRENT_VERSION = "1.0.0"
 
-bible_notes = {}
+# Open SQLite connection for the notes store, set by open_notes_db()
+_db = None
 
+# In-memory copy of the notes store for fast lookups, filled by
+# open_notes_db() and kept in step by add_note() and delete_note().
+# Chapters are ints, matching the database.
+_book_notes = {}    # book -> [text, ...]
+_chapter_notes = {} # (book, chapter) -> [text, ...]
+_verse_notes = {}   # (book, chapter, verse_key) -> [text, ...]
+_group_index = {}   # (book, chapter) -> (starts, [(start, end, verse_key, notes), ...])
+
+# Shared defaults for .get() on lookup misses, so no empty container is
+# allocated per miss. _EMPTY is a tuple so it can't be mutated by accident.
+_EMPTY = ()
+_EMPTY_DICT = {}
 
 app_data_dir = get_app_data_dir()
 os.makedirs(app_data_dir, exist_ok=True)
-NOTES_FILENAME = "bible_notes.json"
+NOTES_FILENAME = "bible_notes.json" # Legacy store, imported once into the database
 NOTES_FILE_PATH = app_data_dir / NOTES_FILENAME 
+NOTES_DB_PATH = app_data_dir / "bible_notes.sqlite"
 DOTENV_FILE_PATH = app_data_dir / ".env"
 HISTORY_FILE_PATH = app_data_dir / ".verse_repl_history"
+HISTORY_MAX_ENTRIES = 5000
+HISTORY_TRIM_BYTES = 1024 * 1024 # Only read and trim the history file past this size
 
 # --- .env Loading ---
 if os.path.exists(DOTENV_FILE_PATH):
@@ -66,31 +106,219 @@ else:
     sys.exit(1)
 
 # --- API Configuration ---
+REQUIRED_ENV_VARS = ("API_URL", "API_KEY", "FILE")
+_missing_env_vars = [name for name in REQUIRED_ENV_VARS if not os.getenv(name)]
+if _missing_env_vars:
+    print(f"Error: Missing {', '.join(_missing_env_vars)} in the .env file: {DOTENV_FILE_PATH}")
+    sys.exit(1)
+
 API_URL = os.getenv("API_URL")
 HEADERS = {"Accept": "application/json", "Authorization": os.getenv("API_KEY")}
 BASE_PARAMS = {"file": os.getenv("FILE"), "Out": "json", "Lang": "eng"}
+REQUEST_TIMEOUT = (3.05, 10) # (connect, read) in seconds
+MAX_FETCH_WORKERS = 8 # Concurrent lookups for ';'-separated references
+STREAM_THRESHOLD = 64 * 1024 # bytes; larger responses are parsed as they arrive
+MIN_VERSES_LENGTH = 20 # bytes; shorter bodies can't hold any verses
+
+# --- HTTP Session ---
+# One shared session so the keep-alive connection to API_URL is reused
+# across lookups instead of paying a new TCP/TLS handshake every time.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=max(10, MAX_FETCH_WORKERS),
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+atexit.register(SESSION.close)
+
+def _leading_int(value):
+    """Returns the leading number of a chapter or verse key ("16-18" -> 16), or 0."""
+    match = _LEADING_INT_RE.match(value or "")
+    return int(match.group()) if match else 0
+
+def _verse_range(verse_key):
+    """
+    Returns (verse_start, verse_end) for a verse key. verse_end is only set
+    for group keys like "16-18"; individual keys return (16, None).
+    """
+    parts = verse_key.split('-')
+    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+        return int(parts[0]), int(parts[1])
+    return _leading_int(verse_key), None
+
+def _bucket_filter(book, chapter, verse_key):
+    """
+    Returns the WHERE clause and params selecting one book, chapter or verse bucket.
+    A None chapter or verse_key selects the wider bucket; the note helpers below
+    all test for None rather than truthiness, so chapter 0 stays a chapter.
+    """
+    if chapter is None:
+        return "book = ? AND chapter IS NULL", (book,)
+    if verse_key is None:
+        return "book = ? AND chapter = ? AND verse_key IS NULL", (book, int(chapter))
+    return "book = ? AND chapter = ? AND verse_key = ?", (book, int(chapter), verse_key)
+
+def _insert_note(book, chapter, verse_key, text):
+    """Inserts a note without committing. Notes keep their insertion order by id."""
+    verse_start, verse_end = (None, None) if verse_key is None else _verse_range(verse_key)
+    _db.execute(
+        "INSERT INTO notes (book, chapter, verse_key, verse_start, verse_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+        (book, None if chapter is None else int(chapter), verse_key, verse_start, verse_end, text)
+    )
 
-def load_notes():
-    """Loads notes from the JSON file into the global bible_notes dictionary."""
-    global bible_notes
+def _migrate_json_notes():
+    """Imports the legacy bible_notes.json file into the database."""
     if not os.path.exists(NOTES_FILE_PATH):
-        bible_notes = {}
         return
     try:
-        with open(NOTES_FILE_PATH, 'r') as f:
-            bible_notes = json.load(f)
-    except (json.JSONDecodeError, IOError) as e:
-        print(f"⚠️ Warning: Could not load notes file. Starting fresh. Error: {e}")
-        bible_notes = {}
-
-def save_notes():
-    """Saves the current bible_notes dictionary to the JSON file."""
-    try:
-        with open(NOTES_FILE_PATH, 'w') as f:
-            json.dump(bible_notes, f, indent=4)
-    except IOError as e:
-        print(f"❌ Error: Could not save notes to file. Error: {e}")
+        legacy_notes = _loads(NOTES_FILE_PATH.read_bytes())
+    except (ValueError, IOError) as e:
+        print(f"⚠️ Warning: Could not import old notes file. Error: {e}")
+        return
 
+    for book, book_data in legacy_notes.items():
+        for note in book_data.get("notes", _EMPTY):
+            _insert_note(book, None, None, note)
+        for chapter, chap_data in book_data.get("chapters", _EMPTY_DICT).items():
+            for note in chap_data.get("notes", _EMPTY):
+                _insert_note(book, chapter, None, note)
+            for verse_key, verse_notes in chap_data.get("verses", _EMPTY_DICT).items():
+                for note in verse_notes:
+                    _insert_note(book, chapter, verse_key, note)
+    print(f"✅ Imported notes from {NOTES_FILE_PATH}")
+
+def _cache_note(book, chapter, verse_key, text):
+    """Appends a note to the in-memory lookup tables."""
+    if chapter is None:
+        _book_notes.setdefault(book, []).append(text)
+        return
+    chapter = int(chapter)
+    if verse_key is None:
+        _chapter_notes.setdefault((book, chapter), []).append(text)
+        return
+
+    notes_list = _verse_notes.get((book, chapter, verse_key))
+    if notes_list is None:
+        notes_list = _verse_notes[(book, chapter, verse_key)] = []
+        start, end = _verse_range(verse_key)
+        if end is not None:
+            # New group: keep the chapter's ranges sorted by start verse
+            starts, ranges = _group_index.setdefault((book, chapter), ([], []))
+            pos = bisect.bisect_right(starts, start)
+            starts.insert(pos, start)
+            ranges.insert(pos, (start, end, verse_key, notes_list))
+    notes_list.append(text)
+
+def _uncache_note(book, chapter, verse_key, note_num):
+    """Removes a note from the in-memory lookup tables, dropping emptied verses."""
+    if chapter is None:
+        _book_notes[book].pop(note_num)
+        return
+    chapter = int(chapter)
+    if verse_key is None:
+        _chapter_notes[(book, chapter)].pop(note_num)
+        return
+
+    notes_list = _verse_notes[(book, chapter, verse_key)]
+    notes_list.pop(note_num)
+    if notes_list:
+        return
+    del _verse_notes[(book, chapter, verse_key)]
+    starts, ranges = _group_index.get((book, chapter), (_EMPTY, _EMPTY))
+    for pos, group in enumerate(ranges):
+        if group[3] is notes_list:
+            del starts[pos]
+            del ranges[pos]
+            break
+
+def open_notes_db():
+    """
+    Opens the SQLite notes database, creating the schema on first run.
+    A brand-new database is seeded from the old JSON notes file, if present.
+    All notes are then read into the in-memory lookup tables.
+    """
+    global _db
+    _db = sqlite3.connect(NOTES_DB_PATH)
+    atexit.register(_db.close)
+    with _db:
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "id INTEGER PRIMARY KEY, "
+            "book TEXT NOT NULL, "
+            "chapter INTEGER, "     # NULL for book notes
+            "verse_key TEXT, "      # NULL for book and chapter notes
+            "verse_start INTEGER, "
+            "verse_end INTEGER, "   # Only set for group notes
+            "text TEXT NOT NULL)"
+        )
+        _db.execute("CREATE INDEX IF NOT EXISTS ix_notes_ref ON notes (book, chapter, verse_start, verse_end)")
+        # user_version 0 means the database was just created
+        if _db.execute("PRAGMA user_version").fetchone()[0] == 0:
+            _migrate_json_notes()
+            _db.execute("PRAGMA user_version = 1")
+
+    for lookup in (_book_notes, _chapter_notes, _verse_notes, _group_index):
+        lookup.clear()
+    for book, chapter, verse_key, text in _db.execute(
+        "SELECT book, chapter, verse_key, text FROM notes ORDER BY id"
+    ):
+        _cache_note(book, chapter, verse_key, text)
+
+def add_note(book, chapter, verse_key, text):
+    """Adds a note to a book, chapter or verse and commits it."""
+    with _db:
+        _insert_note(book, chapter, verse_key, text)
+    _cache_note(book, chapter, verse_key, text)
+
+def get_bucket_notes(book, chapter, verse_key):
+    """Returns the notes for one book, chapter or verse, oldest first."""
+    if chapter is None:
+        return _book_notes.get(book, _EMPTY)
+    if verse_key is None:
+        return _chapter_notes.get((book, int(chapter)), _EMPTY)
+    return _verse_notes.get((book, int(chapter), verse_key), _EMPTY)
+
+def delete_note(book, chapter, verse_key, note_num):
+    """Deletes the note at 0-based position note_num of a bucket and commits it."""
+    where, params = _bucket_filter(book, chapter, verse_key)
+    with _db:
+        _db.execute(
+            f"DELETE FROM notes WHERE id = (SELECT id FROM notes WHERE {where} ORDER BY id LIMIT 1 OFFSET ?)",
+            (*params, note_num)
+        )
+    _uncache_note(book, chapter, verse_key, note_num)
+
+# Pattern to capture (Book) (Chapter) (Verse)
+# Allows for "1 John" or "Song of Solomon"
+# (?:\s*(\d+))? - Optional chapter number
+# (?::\s*([\d\-,]+))? - Optional verse key
+_REF_RE = re.compile(
+    r"^((\d\s)?[A-Za-z\s]+?)\s*"  # Group 1: Book name (e.g., "1 John", "John")
+    r"(\d+)?"                     # Group 3: Chapter (optional)
+    r"(?::\s*([\d\-,]+))?$"        # Group 4: Verse key (optional)
+    , re.IGNORECASE
+)
+_BOOK_ONLY_RE = re.compile(r"^((\d\s)?[A-Za-z\s]+)$", re.IGNORECASE)
+_LEADING_INT_RE = re.compile(r"\d+")
+# /addnote "<reference>" <note>, with the reference in double, single or no quotes
+_ADDNOTE_RE = re.compile(
+    r"""^/addnote\s+(?:"([^"]*)"|'([^']*)'|([^\s"']\S*)\s)\s*(\S.*)$""",
+    re.IGNORECASE | re.DOTALL
+)
+# Maps stray tabs and line breaks to plain spaces in a single pass
+_REF_CLEANER = str.maketrans({"\t": " ", "\r": " ", "\n": " "})
+
+# Keyed by the raw name as typed or returned by the API, so it's bounded
+# like parse_reference's cache rather than left to grow with every variant
+@lru_cache(maxsize=256)
+def _title_cached(name):
+    """Returns name.title(), reusing the string from earlier calls."""
+    return name.title()
+
+@lru_cache(maxsize=4096)
 def parse_reference(ref_string):
     """
     Parses a Bible reference string into its components.
@@ -103,29 +331,18 @@ def parse_reference(ref_string):
     - "John"         -> ("John", None, None)
     - "1 John 3:16"  -> ("1 John", "3", "16")
     """
-    ref_string = ref_string.strip()
-    
-    # Pattern to capture (Book) (Chapter) (Verse)
-    # Allows for "1 John" or "Song of Solomon"
-    # (?:\s*(\d+))? - Optional chapter number
-    # (?::\s*([\d\-,]+))? - Optional verse key
-    pattern = re.compile(
-        r"^((\d\s)?[A-Za-z\s]+?)\s*"  # Group 1: Book name (e.g., "1 John", "John")
-        r"(\d+)?"                     # Group 3: Chapter (optional)
-        r"(?::\s*([\d\-,]+))?$"        # Group 4: Verse key (optional)
-        , re.IGNORECASE
-    )
+    ref_string = ref_string.translate(_REF_CLEANER).strip()
 
-    match = pattern.match(ref_string)
+    match = _REF_RE.match(ref_string)
 
     if not match:
         # Simple case: just a book name like "Genesis"
-        if re.fullmatch(r"^((\d\s)?[A-Za-z\s]+)$", ref_string, re.IGNORECASE):
-             return (ref_string.title(), None, None)
+        if _BOOK_ONLY_RE.fullmatch(ref_string):
+             return (_title_cached(ref_string), None, None)
         return (None, None, None) # Invalid format
 
     # Clean up the matched groups
-    book = match.group(1).strip().title()
+    book = _title_cached(match.group(1).strip())
     chapter = match.group(3)
     verse_key = match.group(4)
 
@@ -136,60 +353,55 @@ def get_notes_for_reference(book, chapter, verse_key, note_level):
     Retrieves all relevant notes for a given reference based on the note_level.
     Returns a dictionary of note lists.
     """
+    # Only "group" is extended below; the rest are replaced or left empty
     notes = {
-        "book": [],
-        "chapter": [],
+        "book": _EMPTY,
+        "chapter": _EMPTY,
         "group": [],
-        "individual": []
+        "individual": _EMPTY
     }
 
-    if not book or book not in bible_notes:
+    if not book:
         return notes
 
     # Level 4: Get BOOK notes
     if note_level >= 4:
-        notes["book"] = bible_notes[book].get("notes", [])
+        notes["book"] = _book_notes.get(book, _EMPTY)
 
-    if not chapter or chapter not in bible_notes[book].get("chapters", {}):
+    if not chapter:
         return notes
 
-    book_chapters = bible_notes[book]["chapters"]
+    chapter_key = (book, int(chapter))
 
     # Level 3: Get CHAPTER notes
     if note_level >= 3:
-        notes["chapter"] = book_chapters[chapter].get("notes", [])
+        notes["chapter"] = _chapter_notes.get(chapter_key, _EMPTY)
     
-    if not verse_key or not book_chapters[chapter].get("verses", {}):
+    if not verse_key:
         return notes
-    
-    chapter_verses = book_chapters[chapter]["verses"]
 
     # Level 1 & 2: Get INDIVIDUAL notes
     if note_level >= 1:
-        notes["individual"] = chapter_verses.get(verse_key, [])
+        notes["individual"] = _verse_notes.get((*chapter_key, verse_key), _EMPTY)
 
     # Level 2: Get GROUP notes
-    if note_level >= 2:
-        # This is more complex: find all group keys (e.g., "16-18")
-        # that contain the current verse_key (e.g., "16")
+    if note_level >= 2 and chapter_key in _group_index:
+        # Find all group keys (e.g., "16-18") that contain
+        # the current verse_key (e.g., "16")
         try:
             current_verse_num = int(verse_key.split('-')[0]) # Get "16" from "16"
-            for key, group_notes in chapter_verses.items():
-                if '-' not in key or key == verse_key:
-                    continue # Skip individual notes or the exact match
-                
-                parts = key.split('-')
-                if len(parts) == 2:
-                    start, end = int(parts[0]), int(parts[1])
-                    if start <= current_verse_num <= end:
-                        notes["group"].extend(group_notes)
+            starts, ranges = _group_index[chapter_key]
+            # Only groups starting at or before this verse can contain it
+            for start, end, key, group_notes in ranges[:bisect.bisect_right(starts, current_verse_num)]:
+                if end >= current_verse_num and key != verse_key:
+                    notes["group"].extend(group_notes)
         except ValueError:
             pass # Ignore if verse_key isn't a simple number (e.g., "1a")
 
     return notes
 
-def format_and_print_notes(notes_dict):
-    """Prints a formatted block of notes."""
+def format_notes(notes_dict, out):
+    """Appends a formatted block of notes to out, one line per entry."""
     # Order matters: from broadest (Book) to narrowest (Individual)
     level_map = [
         ("Book", "book"),
@@ -203,78 +415,145 @@ def format_and_print_notes(notes_dict):
         notes_list = notes_dict.get(key)
         if notes_list:
             if not has_printed_header:
-                print("|| Notes:")
+                out.append("|| Notes:")
                 has_printed_header = True
             
-            print(f"  [{label}]")
+            out.append(f"  [{label}]")
             for i, note in enumerate(notes_list, 1):
-                print(f"    {i}. {note}")
+                out.append(f"    {i}. {note}")
+
+def _append_verse_notes(reference, note_level, out):
+    """Appends the notes for a single verse reference from the API to out."""
+    # Parse the *specific* verse reference from the API response
+    book, chapter, verse_key = parse_reference(reference)
+    if book:
+        notes_dict = get_notes_for_reference(book, chapter, verse_key, note_level)
+        format_notes(notes_dict, out)
+
+def _skip_verse_notes(reference, note_level, out):
+    """Stands in for _append_verse_notes when notes are turned off."""
+    pass
+
+def _iter_verses(response):
+    """
+    Yields the verses of a streamed API response. Large responses (or ones of
+    unknown size) are parsed incrementally with ijson when it's installed, so
+    the whole verse list is never held in memory; small ones are decoded at once.
+    """
+    # Content-Length is the size on the wire, so it only says how big the
+    # JSON is when the body isn't compressed
+    content_length = response.headers.get("Content-Length")
+    is_small = response.status_code == 204 or (
+        content_length is not None
+        and "Content-Encoding" not in response.headers
+        and int(content_length) < STREAM_THRESHOLD
+    )
+    if ijson is None or is_small:
+        # Reading the body in full also hands the connection back to the pool
+        body = response.content
+        # Nothing to parse for empty or near-empty bodies (e.g. {"verses":[]})
+        if len(body) < MIN_VERSES_LENGTH:
+            return
+        data = _loads(body)
+        if data and "verses" in data:
+            yield from data["verses"] or ()
+        return
 
+    response.raw.decode_content = True # Let urllib3 undo any gzip encoding
+    yield from ijson.items(response.raw, "verses.item")
+
+def render_verses(verse_reference, note_level=0):
+    """
+    Fetches the verses for one reference and renders them with their notes.
+    Returns (output, text_to_copy): the text to print for this reference and
+    the "<reference> <text>" lines for the clipboard (empty if nothing was found).
+    Safe to call from worker threads: nothing is printed here, and errors are
+    returned as output rather than raised.
+    """
+    params = {**BASE_PARAMS, "String": verse_reference}
+
+    try:
+        text_to_copy = [] 
+
+        out = ["-" * 40]
+        # note_level is fixed for the whole response, so pick the notes step once
+        append_notes = _append_verse_notes if note_level > 0 else _skip_verse_notes
+
+        with SESSION.get(API_URL, params=params, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            for verse in _iter_verses(response):
+                reference = verse.get("ref", "No Reference")
+                text = verse.get("text", "No Text").strip()
+                
+                out.append(f"\n{reference}")
+                out.append(text)
+                append_notes(reference, note_level, out)
+
+                text_to_copy.append(f'{reference} {text}')
+
+    # ijson reads response.raw directly, so errors while streaming the body
+    # (dropped connection, read timeout) arrive as raw urllib3 exceptions
+    except (requests.exceptions.RequestException, Urllib3HTTPError) as e:
+        return f"\n❌ Network or API error: {e}\n", []
+    except _JSON_ERRORS:
+        return "\n❌ Could not parse the response from the server.\n", []
+    except Exception as e:
+        # Report anything else per reference, so one bad lookup in a
+        # ';' batch can't abort the others
+        return f"\n❌ Error looking up '{verse_reference}': {e}\n", []
+
+    if not text_to_copy:
+        return f"Verse not found for '{verse_reference}'.\n", []
+
+    out.append("\n" + "-" * 40)
+    out.append(f"Found {len(text_to_copy)} verse(s).")
+    return "\n".join(out) + "\n", text_to_copy
 
 def fetch_and_display_verses(verse_reference, enable_copy=False, note_level=0, enable_spacious=False, joiner=None):
     """
     Fetches verses, prints them, handles notes, and handles copy formatting.
+    Several references separated by ';' are fetched concurrently and printed
+    in the order given.
     note_level 0 = no notes
     note_level 1 = individual
     note_level 2 = individual + group (-v default)
     note_level 3 = individual + group + chapter
     note_level 4 = all
     """
-    params = BASE_PARAMS.copy()
-    params["String"] = verse_reference
-
-    try:
-        response = requests.get(API_URL, headers=HEADERS, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        if not data or "verses" not in data or not data["verses"]:
-            print(f"Verse not found for '{verse_reference}'.")
-            return
-        
-        num_results = len(data["verses"]) 
-        text_to_copy = [] 
-
-        print("-" * 40)
-        for verse in data["verses"]:
-            reference = verse.get("ref", "No Reference")
-            text = verse.get("text", "No Text").strip()
-            
-            print(f"\n{reference}")
-            print(text)
-
-            if note_level > 0:
-                # Parse the *specific* verse reference from the API response
-                book, chapter, verse_key = parse_reference(reference)
-                if book:
-                    notes_dict = get_notes_for_reference(book, chapter, verse_key, note_level)
-                    format_and_print_notes(notes_dict)
-
-            text_to_copy.append(f'{reference} {text}')
+    queries = [query.strip() for query in verse_reference.split(';') if query.strip()]
+    if not queries:
+        print("Error: No verse reference given.")
+        return
 
-        print("\n" + "-" * 40)
-        
-        print(f"Found {num_results} verse(s).") 
+    if len(queries) == 1:
+        results = [render_verses(queries[0], note_level)]
+    else:
+        # The session's connection pool is at least MAX_FETCH_WORKERS wide,
+        # so every worker gets its own keep-alive connection
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(queries))) as executor:
+            results = list(executor.map(lambda query: render_verses(query, note_level), queries))
+
+    # Collect all output and write it in one go
+    text_to_copy = []
+    for output, verses in results:
+        text_to_copy.extend(verses)
+    sys.stdout.write("".join(output for output, _ in results))
+
+    if enable_copy and text_to_copy:
+        final_joiner = "\n" # Default
+        if joiner is not None:
+            final_joiner = joiner
+        elif enable_spacious:
+            final_joiner = "\n\n"
         
-        if enable_copy:
-            final_joiner = "\n" # Default
-            if joiner is not None:
-                final_joiner = joiner
-            elif enable_spacious:
-                final_joiner = "\n\n"
-            
-            pyperclip.copy(final_joiner.join(text_to_copy))
-            print("✅ Verses copied to clipboard.")
-
-    except requests.exceptions.RequestException as e:
-        print(f"\n❌ Network or API error: {e}")
-    except ValueError:
-        print("\n❌ Could not parse the response from the server.")
+        pyperclip.copy(final_joiner.join(text_to_copy))
+        print("✅ Verses copied to clipboard.")
 
 def print_help():
     print(f"--- Bible Verse Fetcher {CURRENT_VERSION} ---")
     print("Created by: solaceinthenight")
     print("Enter a verse reference (e.g., 'John 3:16').")
+    print("Separate several references with ';' to look them up together (e.g., 'John 3:16; Rom 8:28').")
     print("Flags (can be placed anywhere):")
     print("  -c : Copy the result to the clipboard.")
     print("  -s : Add a blank line between verses when copying (spacious).")
@@ -293,11 +572,95 @@ def print_help():
     print("Type 'quit' or 'exit' to end the program.")
 
 
+def trim_history_file():
+    """
+    Keeps only the newest HISTORY_MAX_ENTRIES entries in the REPL history file
+    so it can't grow without bound. FileHistory starts every entry with a
+    "# <timestamp>" line, which is what entries are counted by.
+    Files under HISTORY_TRIM_BYTES are left alone without being read, so a
+    normal startup only pays for a stat() call.
+    """
+    try:
+        if not HISTORY_FILE_PATH.exists() or HISTORY_FILE_PATH.stat().st_size <= HISTORY_TRIM_BYTES:
+            return
+        lines = HISTORY_FILE_PATH.read_bytes().splitlines(keepends=True)
+        entry_starts = [i for i, line in enumerate(lines) if line.startswith(b"#")]
+        if len(entry_starts) <= HISTORY_MAX_ENTRIES:
+            return
+
+        keep_from = entry_starts[-HISTORY_MAX_ENTRIES]
+        tmp_path = HISTORY_FILE_PATH.with_name(HISTORY_FILE_PATH.name + ".tmp")
+        tmp_path.write_bytes(b"\n" + b"".join(lines[keep_from:]))
+        os.replace(tmp_path, HISTORY_FILE_PATH)
+    except OSError as e:
+        print(f"⚠️ Warning: Could not trim the history file. Error: {e}")
+
+def split_input(user_input):
+    """
+    Splits a REPL line into tokens. Plain str.split() is used unless the
+    line contains quotes or backslashes that need shlex's parsing.
+    """
+    if '"' not in user_input and "'" not in user_input and "\\" not in user_input:
+        return user_input.split()
+    return shlex.split(user_input)
+
+# --- Flag Handlers ---
+# Each handler receives (parts, i, options) where parts[i] is the flag,
+# updates options, and returns the index of the next token to read,
+# or None after printing an error.
+
+def _flag_copy(parts, i, options):
+    options["flags"].add('-c')
+    return i + 1
+
+def _flag_spacious(parts, i, options):
+    options["flags"].add('-s')
+    return i + 1
+
+def _flag_view_notes(parts, i, options):
+    options["flags"].add('-v')
+    if options["note_level"] == 0: # Don't override a specific -n
+        options["note_level"] = 2
+    return i + 1
+
+def _flag_joiner(parts, i, options):
+    if i + 1 >= len(parts):
+        print("Error: -j flag requires a joiner string argument.")
+        return None
+    options["joiner"] = codecs.decode(parts[i+1], 'unicode_escape')
+    return i + 2
+
+def _flag_note_level(parts, i, options):
+    if i + 1 >= len(parts):
+        print("Error: -n flag requires a level number (1-4).")
+        return None
+    try:
+        level = int(parts[i+1])
+    except ValueError:
+        print("Error: -n flag requires a number (1-4).")
+        return None
+    if not 1 <= level <= 4:
+        print("Error: -n level must be between 1 and 4.")
+        return None
+    options["note_level"] = level
+    return i + 2
+
+_FLAG_HANDLERS = {
+    '-c': _flag_copy,
+    '-s': _flag_spacious,
+    '-v': _flag_view_notes,
+    '-j': _flag_joiner,
+    '-n': _flag_note_level,
+}
+
+
 def start_repl():
     """Main function to run the REPL (Read-Eval-Print Loop)."""
-    load_notes()
+    open_notes_db()
 
-    repl_history = FileHistory(HISTORY_FILE_PATH)
+    trim_history_file()
+    # Load the history file in the background so a long history doesn't delay the prompt
+    repl_history = ThreadedHistory(FileHistory(HISTORY_FILE_PATH))
 
     print_help()
     
@@ -313,53 +676,41 @@ def start_repl():
         
         if user_input.startswith('/'):
             try:
-                parts = shlex.split(user_input)
-                command = parts[0].lower()
+                command = user_input.split(maxsplit=1)[0].lower()
 
                 if command =="/help":
                     print_help()
                     continue
 
                 if command == "/addnote":
-                    if len(parts) < 3:
+                    # Match the raw line so the note text is kept exactly as typed
+                    match = _ADDNOTE_RE.match(user_input)
+                    if not match:
                         print("Usage: /addnote \"<reference>\" <note>")
                         continue
-                    ref_string, note_text = parts[1], " ".join(parts[2:])
+                    double_quoted, single_quoted, unquoted, note_text = match.groups()
+                    ref_string = next(ref for ref in (double_quoted, single_quoted, unquoted) if ref is not None)
                     book, chapter, verse_key = parse_reference(ref_string)
 
                     if not book:
                         print(f"Error: Invalid reference format '{ref_string}'")
                         continue
 
-                    # Ensure path exists
-                    if book not in bible_notes:
-                        bible_notes[book] = {"notes": [], "chapters": {}}
-                    
+                    add_note(book, chapter, verse_key, note_text)
+
                     # Case 1: Book-level note (e.g., "John")
                     if not chapter:
-                        bible_notes[book]["notes"].append(note_text)
                         print(f"✅ Note added for Book: '{book}'")
-                    
                     # Case 2: Chapter-level note (e.g., "John 3")
-                    elif chapter and not verse_key:
-                        if chapter not in bible_notes[book]["chapters"]:
-                            bible_notes[book]["chapters"][chapter] = {"notes": [], "verses": {}}
-                        bible_notes[book]["chapters"][chapter]["notes"].append(note_text)
+                    elif not verse_key:
                         print(f"✅ Note added for Chapter: '{book} {chapter}'")
-
                     # Case 3: Verse-level note (e.g., "John 3:16" or "John 3:16-17")
                     else:
-                        if chapter not in bible_notes[book]["chapters"]:
-                            bible_notes[book]["chapters"][chapter] = {"notes": [], "verses": {}}
-                        if verse_key not in bible_notes[book]["chapters"][chapter]["verses"]:
-                            bible_notes[book]["chapters"][chapter]["verses"][verse_key] = []
-                        bible_notes[book]["chapters"][chapter]["verses"][verse_key].append(note_text)
                         print(f"✅ Note added for Verse: '{book} {chapter}:{verse_key}'")
-
-                    save_notes()
                     continue
 
                 if command == "/delnote":
+                    parts = split_input(user_input)
                     if len(parts) != 3:
                         print("Usage: /delnote \"<reference>\" <note_number>")
                         continue
@@ -372,60 +723,54 @@ def start_repl():
                         continue
                     
                     note_num = int(note_num_str) - 1 # Convert to 0-based index
-                    target_list = None
-                    ref_name = ""
-
-                    try:
-                        # Case 1: Book note
-                        if not chapter:
-                            target_list = bible_notes[book]["notes"]
-                            ref_name = book
-                        # Case 2: Chapter note
-                        elif chapter and not verse_key:
-                            target_list = bible_notes[book]["chapters"][chapter]["notes"]
-                            ref_name = f"{book} {chapter}"
-                        # Case 3: Verse note
-                        else:
-                            target_list = bible_notes[book]["chapters"][chapter]["verses"][verse_key]
-                            ref_name = f"{book} {chapter}:{verse_key}"
 
-                        if 0 <= note_num < len(target_list):
-                            deleted_note = target_list.pop(note_num)
-                            print(f"✅ Deleted note #{note_num + 1} for '{ref_name}': '{deleted_note}'")
-                            save_notes()
-                        else:
-                            print(f"Error: Invalid note number. Must be between 1 and {len(target_list)}.")
-                    
-                    except (KeyError, TypeError):
+                    # Case 1: Book note
+                    if not chapter:
+                        ref_name = book
+                    # Case 2: Chapter note
+                    elif not verse_key:
+                        ref_name = f"{book} {chapter}"
+                    # Case 3: Verse note
+                    else:
+                        ref_name = f"{book} {chapter}:{verse_key}"
+
+                    target_notes = get_bucket_notes(book, chapter, verse_key)
+                    if not target_notes:
                         print(f"Error: No notes found for reference '{ref_string}'.")
-                    except ValueError:
-                         print("Error: Note number must be an integer.")
+                    elif 0 <= note_num < len(target_notes):
+                        deleted_note = target_notes[note_num]
+                        delete_note(book, chapter, verse_key, note_num)
+                        print(f"✅ Deleted note #{note_num + 1} for '{ref_name}': '{deleted_note}'")
+                    else:
+                        print(f"Error: Invalid note number. Must be between 1 and {len(target_notes)}.")
                     continue
 
                 if command == "/allnotes":
-                    if not bible_notes:
+                    rows = _db.execute(
+                        "SELECT book, chapter, verse_key, text FROM notes "
+                        "ORDER BY book, chapter, verse_start, verse_key, id"
+                    ).fetchall()
+                    if not rows:
                         print("No notes found.")
                         continue
                     
-                    print("\n--- All Notes ---")
-                    for book, book_data in bible_notes.items():
-                        if book_data["notes"]:
-                            print(f"\n[{book}]")
-                            for i, note in enumerate(book_data["notes"], 1):
-                                print(f"  {i}. {note}")
-                        
-                        for chapter, chap_data in book_data.get("chapters", {}).items():
-                            if chap_data["notes"]:
-                                print(f"  [{book} {chapter}]")
-                                for i, note in enumerate(chap_data["notes"], 1):
-                                    print(f"    {i}. {note}")
-                            
-                            for verse_key, verse_notes in chap_data.get("verses", {}).items():
-                                if verse_notes:
-                                    print(f"    [{book} {chapter}:{verse_key}]")
-                                    for i, note in enumerate(verse_notes, 1):
-                                        print(f"      {i}. {note}")
-                    print("-----------------")
+                    # NULLs sort first, so each book's notes come before its
+                    # chapters, and each chapter's notes before its verses
+                    out = ["\n--- All Notes ---"]
+                    for (book, chapter, verse_key), bucket in groupby(rows, key=lambda row: row[:3]):
+                        if chapter is None:
+                            out.append(f"\n[{book}]")
+                            indent = "  "
+                        elif verse_key is None:
+                            out.append(f"  [{book} {chapter}]")
+                            indent = "    "
+                        else:
+                            out.append(f"    [{book} {chapter}:{verse_key}]")
+                            indent = "      "
+                        for i, row in enumerate(bucket, 1):
+                            out.append(f"{indent}{i}. {row[3]}")
+                    out.append("-----------------")
+                    print("\n".join(out))
                     continue
                 
                 print(f"Unknown command: {command}")
@@ -434,65 +779,33 @@ def start_repl():
             continue
 
         try:
-            parts = shlex.split(user_input)
+            parts = split_input(user_input)
         except ValueError as e:
             print(f"Error: Mismatched quotes in input. {e}")
             continue
 
-        flags = set()
+        options = {"flags": set(), "joiner": None, "note_level": 0} # Default: no notes
         query_parts = []
-        joiner_str = None
-        note_level = 0 # Default: no notes
         has_error = False
         
         i = 0
         while i < len(parts):
-            part = parts[i]
-            if part == '-c':
-                flags.add('-c')
-                i += 1
-            elif part == '-s':
-                flags.add('-s')
-                i += 1
-            elif part == '-v':
-                flags.add('-v')
-                if note_level == 0: # Don't override a specific -n
-                    note_level = 2 
-                i += 1
-            elif part == '-j':
-                if i + 1 < len(parts):
-                    joiner_str = codecs.decode(parts[i+1], 'unicode_escape')
-                    i += 2 
-                else:
-                    print("Error: -j flag requires a joiner string argument.")
-                    has_error = True
-                    break
-            elif part == '-n': 
-                if i + 1 < len(parts):
-                    try:
-                        level = int(parts[i+1])
-                        if 1 <= level <= 4:
-                            note_level = level
-                        else:
-                            print("Error: -n level must be between 1 and 4.")
-                            has_error = True
-                            break
-                        i += 2
-                    except ValueError:
-                        print("Error: -n flag requires a number (1-4).")
-                        has_error = True
-                        break
-                else:
-                    print("Error: -n flag requires a level number (1-4).")
-                    has_error = True
-                    break
-            else:
-                query_parts.append(part)
+            handler = _FLAG_HANDLERS.get(parts[i])
+            if handler is None:
+                query_parts.append(parts[i])
                 i += 1
+                continue
+            i = handler(parts, i, options)
+            if i is None:
+                has_error = True
+                break
         
         if has_error:
             continue
 
+        flags = options["flags"]
+        joiner_str = options["joiner"]
+        note_level = options["note_level"]
         verse_query = " ".join(query_parts)
         enable_copy = '-c' in flags
         enable_spacious = '-s' in flags